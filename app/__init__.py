@@ -1,8 +1,13 @@
+import os
+
 from dotenv import find_dotenv, load_dotenv
 from flask import Flask
+from sqlalchemy import event
 from app.json_provider import JSONProvider
 
+from app.cache import cache
 from app.database import db
+from sqlite_pragmas import set_sqlite_pragmas
 from app.blueprint import book
 
 load_dotenv(find_dotenv())
@@ -13,13 +18,26 @@ def create_app():
 
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///example.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'connect_args': {'cached_statements': 256}
+    }
+
+    # SimpleCache is per process, so deployments with several workers should
+    # set CACHE_TYPE to a shared backend (FileSystemCache or RedisCache)
+    app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'SimpleCache')
+    app.config['CACHE_DEFAULT_TIMEOUT'] = 60
+    for key in ('CACHE_DIR', 'CACHE_REDIS_URL'):
+        if key in os.environ:
+            app.config[key] = os.environ[key]
 
     db.init_app(app)
+    cache.init_app(app)
     app.json = JSONProvider(app)
 
     app.register_blueprint(book)
 
     with app.app_context():
+        event.listen(db.engine, "connect", set_sqlite_pragmas)
         db.create_all()
 
     return app
@@ -1,71 +1,74 @@
 # bluueprint.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, current_app, request, jsonify
+from flask.views import MethodView
 from app.book import Book
+from app.cache import cache
+from app.database import db
 
 book = Blueprint('book', __name__)
 
 
-@book.route("/book", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
-def index():
-    if request.method == "GET":
-        return get()
-    elif request.method == "POST":
-        return create()
-    elif request.method in ["PUT", "PATCH"]:
-        return update()
-    elif request.method == "DELETE":
-        return delete()
-
-
-def create():
-    payload = request.get_json(silent=True)
-    if not payload:
-        return jsonify({"error": "Invalid or no JSON payload provided"}), 400
-
-    title = payload.get("title")
-    if not title:
-        return jsonify({"error": "Title is required"}), 400
-
-    try:
-        new_book = Book.create(**payload)
-        return jsonify(new_book.to_dict()), 201
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-def get():
-    obj = _by_request_id()
-    if not obj:
-        return jsonify({"error": "Book not found"}), 404
-    return jsonify(obj.to_dict()), 200
-
-
-def update():
-    obj = _by_request_id()
-    payload = request.get_json(silent=True)
-    if not payload:
-        return jsonify({"error": "Invalid or no JSON payload provided"}), 400
-    try:
-        updated_obj = obj.update(**payload)
-        return jsonify(updated_obj.to_dict()), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-def delete():
-    obj = _by_request_id()
-    try:
-        deleted_obj = obj.delete()
-        return jsonify(deleted_obj.to_dict()), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
-def _by_request_id():
-    book_id = request.args.get('id')
-    if not book_id:
-        return None
-    obj = Book.get(_id=book_id)
-    if not obj:
-        return None
-    return obj
+class BookView(MethodView):
+    def post(self):
+        payload = request.get_json(silent=True)
+        if not payload:
+            return jsonify({"error": "Invalid or no JSON payload provided"}), 400
+
+        title = payload.get("title")
+        if not title:
+            return jsonify({"error": "Title is required"}), 400
+
+        try:
+            new_book = Book.create(**payload)
+            return jsonify(new_book.to_dict()), 201
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    def get(self):
+        body = _book_json(_request_book_id())
+        return current_app.response_class(body, mimetype="application/json"), 200
+
+    def put(self):
+        obj = db.get_or_404(Book, _request_book_id(), description="Book not found")
+        payload = request.get_json(silent=True)
+        if not payload:
+            return jsonify({"error": "Invalid or no JSON payload provided"}), 400
+        try:
+            updated_obj = obj.update(**payload)
+            cache.delete_memoized(_book_json, updated_obj._id)
+            return jsonify(updated_obj.to_dict()), 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    patch = put
+
+    def delete(self):
+        obj = db.get_or_404(Book, _request_book_id(), description="Book not found")
+        try:
+            deleted_obj = obj.delete()
+            cache.delete_memoized(_book_json, deleted_obj._id)
+            return jsonify(deleted_obj.to_dict()), 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+
+book.add_url_rule("/book", view_func=BookView.as_view("index"))
+
+
+@book.errorhandler(404)
+def not_found(e):
+    return jsonify({"error": e.description}), 404
+
+
+def _request_book_id():
+    book_id = request.args.get('id', type=int)
+    if book_id is None:
+        abort(404, description="Book not found")
+    return book_id
+
+
+@cache.memoize()
+def _book_json(book_id):
+    # Cache the serialized body so repeated GETs skip both the query and the encoding
+    obj = db.get_or_404(Book, book_id, description="Book not found")
+    return current_app.json.dumps(obj.to_dict())
@@ -1,5 +1,6 @@
 from flask_serialize import FlaskSerialize
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+# Keep attributes loaded after commit so create/update don't need a refresh SELECT
+db = SQLAlchemy(session_options={"expire_on_commit": False})
 serialize = FlaskSerialize(db)
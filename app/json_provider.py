@@ -1,33 +1,81 @@
-from datetime import date, datetime, time
 from decimal import Decimal
-from uuid import UUID
 
+import orjson
 from flask.json.provider import DefaultJSONProvider
 from sqlalchemy.orm.state import InstanceState
 
 
+def _to_dict(obj):
+    return obj.to_dict()
+
+
+def _complex(obj):
+    return {"real": obj.real, "imag": obj.imag}
+
+
+def _decode(obj):
+    return obj.decode("utf-8")
+
+
 class JSONProvider(DefaultJSONProvider):
+    # orjson handles datetime, date, time, UUID and tuple natively, so only
+    # the remaining types need a fallback. Handlers are keyed on the exact
+    # type and filled in by _resolve on first sight.
+    _HANDLERS = {
+        Decimal: float,
+        set: list,
+        complex: _complex,
+        bytes: _decode,
+    }
+
+    @staticmethod
+    def _resolve(obj):
+        if isinstance(obj, InstanceState):
+            return str
+        elif hasattr(obj, "_sa_instance_state"):
+            return _to_dict
+        elif isinstance(obj, Decimal):
+            return float
+        elif isinstance(obj, set):
+            return list
+        elif isinstance(obj, complex):
+            return _complex
+        elif isinstance(obj, bytes):
+            return _decode
+        else:
+            return str
+
     def default(self, obj):
         try:
-            if isinstance(obj, InstanceState):
-                return str(obj)
-            elif hasattr(obj, "_sa_instance_state"):
-                return obj.to_dict()
-            elif isinstance(obj, (datetime, date, time)):
-                return obj.isoformat()
-            elif isinstance(obj, UUID):
-                return str(obj)
-            elif isinstance(obj, Decimal):
-                return float(obj)
-            elif isinstance(obj, set):
-                return list(obj)
-            elif isinstance(obj, tuple):
-                return list(obj)
-            elif isinstance(obj, complex):
-                return {"real": obj.real, "imag": obj.imag}
-            elif isinstance(obj, bytes):
-                return obj.decode("utf-8")
-            else:
-                return str(obj)
+            handler = self._HANDLERS.get(type(obj))
+            if handler is None:
+                handler = self._HANDLERS[type(obj)] = self._resolve(obj)
+            return handler(obj)
         except Exception as e:
             return str(obj)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def _option(self, indent=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj, default=self.default, option=self._option(kwargs.get("indent"))
+        ).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        body = orjson.dumps(
+            obj, default=self.default,
+            option=self._option(indent) | orjson.OPT_APPEND_NEWLINE
+        )
+        return self._app.response_class(body, mimetype=self.mimetype)
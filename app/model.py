@@ -23,18 +23,30 @@ class Model(db.Model, serialize):
         if not hasattr(cls, '__tablename__'):
             cls.__tablename__ = inflection.underscore(cls.__name__)
 
+    @classmethod
+    def _columns(cls):
+        # Resolved once per model class, after the mapper is configured
+        columns = cls.__dict__.get('_column_keys')
+        if columns is None:
+            columns = cls._column_keys = tuple(
+                attr.key for attr in cls.__mapper__.column_attrs)
+        return columns
+
     def to_dict(self):
-        return vars(self)
+        return {key: getattr(self, key) for key in self._columns()}
 
     @classmethod
     def create(cls, **kwargs):
         obj = cls(**kwargs)
         db.session.add(obj)
         db.session.commit()
-        return db.session.refresh(obj) or obj
+        return obj
 
     @classmethod
     def get(cls, **kwargs):
+        if kwargs.keys() == {'_id'}:
+            # Primary key lookups can be served from the identity map
+            return db.session.get(cls, kwargs['_id'])
         return cls.query.filter_by(**kwargs).first()
 
     def update(self, **kwargs):
@@ -43,7 +55,7 @@ class Model(db.Model, serialize):
                 setattr(self, key, value)
         self._updated_at = datetime.now()
         db.session.commit()
-        return db.session.refresh(self) or self
+        return self
 
     def delete(self):
         obj = self
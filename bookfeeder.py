@@ -1,19 +1,32 @@
 import csv
 import enum
 import feedparser
+import functools
 import requests
 import json
 import logging
-from sqlalchemy import create_engine, Column, Integer, String, Enum
+import orjson
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from logging.handlers import RotatingFileHandler
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from sqlalchemy import create_engine, event, select, update, Column, Integer, String, Enum
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlite_pragmas import set_sqlite_pragmas
 
 logging.basicConfig(
-    level=logging.DEBUG,  # Set to DEBUG to capture all levels of logs
+    level=logging.INFO,  # Set to DEBUG to also log MyAnonamouse payloads
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler("debug.log"),  # Logs will be written to debug.log
-        logging.StreamHandler()            # Logs will also be output to the console
+        # Logs will be written to debug.log, rotated at 10 MB
+        RotatingFileHandler("debug.log", maxBytes=10_000_000, backupCount=3),
+        logging.StreamHandler()  # Logs will also be output to the console
     ]
 )
 
@@ -22,6 +35,36 @@ logging.basicConfig(
 Base = declarative_base()
 
 
+# Keys per bulk UPDATE ... WHERE canonical_key IN (...) statement
+UPDATE_CHUNK_SIZE = 900
+
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def canonical(s):
+    """
+    Canonicalize a string for fuzzy comparison: diacritics and compatibility forms are
+    folded away, it is lowercased, and runs of punctuation/whitespace become single spaces.
+    """
+    decomposed = unicodedata.normalize('NFKD', s)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return NON_WORD_RE.sub(' ', stripped.lower()).strip()
+
+
+def book_key(authors, title):
+    """
+    Single lookup key for a book, so Goodreads and Calibre spellings that differ only
+    in case, punctuation or diacritics compare equal.
+    """
+    return canonical(authors) + '\x1f' + canonical(title)
+
+
+def default_book_key(context):
+    """Column default that fills canonical_key from the row being inserted."""
+    params = context.get_current_parameters()
+    return book_key(params['authors'], params['title'])
+
+
 class BookStatus(enum.Enum):
     ACTIVE = "active"
     MISSING = "missing"
@@ -35,6 +78,8 @@ class Book(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     authors = Column(String, nullable=False)
     title = Column(String, nullable=False)
+    canonical_key = Column(String, default=default_book_key,
+                           nullable=False, unique=True, index=True)
     status = Column(Enum(BookStatus),
                     default=BookStatus.ACTIVE, nullable=False)
 
@@ -56,6 +101,16 @@ class Library(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     authors = Column(String, nullable=False)
     title = Column(String, nullable=False)
+    canonical_key = Column(String, default=default_book_key,
+                           nullable=False, unique=True, index=True)
+
+    @staticmethod
+    def load_keys(session):
+        """
+        Returns the set of canonical book keys in the library, loaded with a single
+        column-only SELECT so no ORM objects are built.
+        """
+        return set(session.scalars(select(Library.canonical_key)))
 
     @staticmethod
     def scan_and_update_books(session):
@@ -64,25 +119,35 @@ class Library(Base):
         - If a book is in the library and in the books table, mark it as active.
         - If a book is in the library but not in the books table, add it as active.
         """
-        library_books = session.query(Library).all()
+        library_books = {key: (authors.strip(), title.strip()) for key, authors, title in
+                         session.execute(select(Library.canonical_key, Library.authors, Library.title))}
         print(f"[DEBUG] Found {len(library_books)} books in the library.")
 
-        for lib_book in library_books:
-            authors = lib_book.authors.strip()
-            title = lib_book.title.strip()
-
-            book = session.query(Book).filter_by(
-                authors=authors, title=title).first()
-            if book:
-                print(
-                    f"[DEBUG] Marking '{title}' by '{authors}' as active in books table.")
-                book.mark_as_active()
-            else:
-                print(
-                    f"[DEBUG] Adding '{title}' by '{authors}' to the books table.")
-                new_book = Book(authors=authors, title=title,
-                                status=BookStatus.ACTIVE)
-                session.add(new_book)
+        # Load every known book once instead of querying per library entry
+        existing = {key: status for key, status in
+                    session.execute(select(Book.canonical_key, Book.status))}
+
+        to_activate = [key for key in library_books
+                       if key in existing and existing[key] is not BookStatus.ACTIVE]
+        to_insert = [{"authors": authors, "title": title, "canonical_key": key,
+                      "status": BookStatus.ACTIVE}
+                     for key, (authors, title) in library_books.items() if key not in existing]
+
+        if to_activate:
+            print(
+                f"[DEBUG] Marking {len(to_activate)} books as active in books table.")
+            # Chunk to stay under SQLite's bound-parameter limit
+            for start in range(0, len(to_activate), UPDATE_CHUNK_SIZE):
+                session.execute(
+                    update(Book)
+                    .where(Book.canonical_key.in_(
+                        to_activate[start:start + UPDATE_CHUNK_SIZE]))
+                    .values(status=BookStatus.ACTIVE)
+                    .execution_options(synchronize_session=False))
+        if to_insert:
+            print(f"[DEBUG] Adding {len(to_insert)} books to the books table.")
+            session.execute(
+                sqlite_insert(Book.__table__).on_conflict_do_nothing(), to_insert)
         session.commit()
 
     @staticmethod
@@ -91,22 +156,48 @@ class Library(Base):
         Given a list of Goodreads RSS feed URLs, returns a list of books that are in the Goodreads RSS
         but NOT in the library. These represent books that are missing from your actual collection.
         """
+        # Books already in the library count as seen, so one lookup covers both checks
+        seen = Library.load_keys(session)
         missing_books = []
 
-        for feed_url in feed_urls:
-            print(f"[DEBUG] Parsing feed: {feed_url}")
-            feed = feedparser.parse(feed_url)
+        if not feed_urls:
+            return missing_books
 
-            # If there's a parsing error, skip this feed
-            if feed.bozo:
-                print(f"[ERROR] Problem parsing feed: {feed_url}")
-                continue
+        caches = {cache.url: cache for cache in
+                  session.query(FeedCache).filter(FeedCache.url.in_(feed_urls))}
 
-            # Iterate over each entry
-            for entry in feed.entries:
-                authors = entry.get('author_name')
-                title = entry.get('title')
+        etags = [caches[url].etag if url in caches else None for url in feed_urls]
+        modifieds = [caches[url].modified if url in caches else None for url in feed_urls]
 
+        # Fetch all feeds concurrently; parsing and DB access stay on this thread
+        with ThreadPoolExecutor(max_workers=min(FEED_FETCH_WORKERS, len(feed_urls))) as executor:
+            responses = list(executor.map(fetch_feed, feed_urls, etags, modifieds))
+
+        for feed_url, resp in zip(feed_urls, responses):
+            if resp is not None and resp.status_code == 304:
+                print(f"[DEBUG] Feed unchanged, using cached entries: {feed_url}")
+                entries = json.loads(caches[feed_url].entries)
+            else:
+                print(f"[DEBUG] Parsing feed: {feed_url}")
+                entries = parse_feed_entries(resp.content) if resp is not None and resp.ok else None
+
+                # If there's a fetch or parsing error, skip this feed
+                if entries is None:
+                    print(f"[ERROR] Problem parsing feed: {feed_url}")
+                    continue
+
+                # Without validators the next fetch can't be conditional, so don't store it
+                etag = resp.headers.get('ETag')
+                modified = resp.headers.get('Last-Modified')
+                if etag or modified:
+                    session.merge(FeedCache(
+                        url=feed_url, etag=etag, modified=modified,
+                        entries=json.dumps(entries, ensure_ascii=False)))
+                elif feed_url in caches:
+                    session.delete(caches[feed_url])
+
+            # Iterate over each entry
+            for authors, title in entries:
                 if not authors or not title:
                     print(
                         f"[WARNING] Feed entry missing required fields. Authors: {authors}, Title: {title}")
@@ -115,57 +206,181 @@ class Library(Base):
                 authors = authors.strip()
                 title = title.strip()
 
-                # Check if this book is in the library
-                book_in_library = session.query(Library).filter_by(
-                    authors=authors, title=title).first()
-
                 # If not in library, consider it missing and avoid duplicates
-                if not book_in_library:
-                    if not any(book for book in missing_books if book['authors'] == authors and book['title'] == title):
-                        missing_books.append(
-                            {"authors": authors, "title": title})
+                key = book_key(authors, title)
+                if key in seen:
+                    continue
+                seen.add(key)
+                missing_books.append({"authors": authors, "title": title})
 
+        session.commit()
         return missing_books
 
 
+class FeedCache(Base):
+    """
+    Remembers the ETag/Last-Modified validators and entries of the last successful
+    fetch of an RSS feed, so an unchanged feed can be answered with a 304.
+    """
+    __tablename__ = 'feed_cache'
+    url = Column(String, primary_key=True)
+    etag = Column(String)
+    modified = Column(String)
+    # JSON list of [authors, title] pairs
+    entries = Column(String, nullable=False, default='[]')
+
+
+def fetch_feed(feed_url, etag=None, modified=None):
+    """
+    Fetch an RSS feed, sending the cached validators so an unchanged feed returns 304.
+    Only does network I/O, so it is safe to call from worker threads.
+    Returns None if the request failed.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if modified:
+        headers['If-Modified-Since'] = modified
+
+    try:
+        return feed_session.get(feed_url, headers=headers, timeout=HTTP_TIMEOUT)
+    except requests.RequestException as e:
+        logging.error(f"Failed to fetch feed {feed_url}: {e}")
+        return None
+
+
+# Feeds are remote input: never resolve entities or fetch DTDs while parsing them
+RSS_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+
+
+def parse_feed_entries(content):
+    """
+    Extract (authors, title) pairs from the items of a Goodreads RSS document.
+    Falls back to feedparser if the document isn't well-formed XML.
+    Returns None if the feed can't be parsed at all.
+    """
+    try:
+        root = etree.fromstring(content, RSS_PARSER)
+    except etree.XMLSyntaxError:
+        feed = feedparser.parse(content)
+        if feed.bozo:
+            return None
+        return [(entry.get('author_name'), entry.get('title'))
+                for entry in feed.entries]
+
+    return [(item.findtext('author_name'), item.findtext('title'))
+            for item in root.iter('item')]
+
+
+CSV_IMPORT_CHUNK_SIZE = 10000
+
+
 def import_books_from_csv(csv_file_path, session):
     """
     Import books from a CSV file into the Library table. The CSV must have 'authors' and 'title' columns.
     These represent the books you currently have in your local collection.
+    The import runs in its own transaction, so the session must not have one in progress.
     """
     with open(csv_file_path, 'r', encoding='utf-8-sig') as file:
-        reader = csv.DictReader(file)
+        reader = csv.reader(file)
+        header = next(reader, [])
 
-        print("Detected CSV Headers:", reader.fieldnames)
+        print("Detected CSV Headers:", header)
 
-        if 'authors' not in reader.fieldnames or 'title' not in reader.fieldnames:
+        if 'authors' not in header or 'title' not in header:
             raise ValueError(
                 "CSV file must contain 'authors' and 'title' columns.")
 
+        # Only two columns are needed, so index them directly instead of building a dict per row
+        authors_index = header.index('authors')
+        title_index = header.index('title')
+        min_length = max(authors_index, title_index) + 1
+
+        # Stream the rows so only one chunk is held in memory at a time
+        pairs = ((row[authors_index].strip(), row[title_index].strip())
+                 for row in reader if len(row) >= min_length)
+        rows = ({"authors": authors, "title": title}
+                for authors, title in pairs if authors and title)
+
+        # Run the whole import as one transaction so SQLite only syncs once, at commit.
+        # The unique canonical_key drops books that are already in the library.
+        statement = sqlite_insert(Library.__table__).on_conflict_do_nothing()
         count = 0
-        for row in reader:
-            authors = row.get('authors')
-            title = row.get('title')
+        with session.begin():
+            while chunk := list(islice(rows, CSV_IMPORT_CHUNK_SIZE)):
+                count += session.execute(statement, chunk).rowcount
+    print(f"Imported {count} new books from CSV.")
 
-            if authors and title:
-                authors = authors.strip()
-                title = title.strip()
 
-                if authors and title:
-                    existing_book = session.query(Library).filter_by(
-                        authors=authors, title=title).first()
-                    if not existing_book:
-                        session.add(Library(authors=authors, title=title))
-                        count += 1
+def upgrade_schema(engine):
+    """
+    Rebuild books/library tables created before the canonical_key column existed.
+    create_all() never alters existing tables, and SQLite can't add a NOT NULL column
+    to one, so the old table is renamed, recreated from the model, and its rows copied
+    over with their keys. Rows whose keys collide are collapsed onto the oldest one.
+    """
+    with engine.begin() as conn:
+        for table in (Book.__table__, Library.__table__):
+            columns = {row[1] for row in
+                       conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+            if not columns or 'canonical_key' in columns:
+                continue
+
+            logging.info(f"Upgrading table {table.name}: adding canonical_key")
+            old_name = f"{table.name}_old"
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {old_name}")
+            table.create(conn)
+
+            names = [column.name for column in table.columns
+                     if column.name != 'canonical_key']
+            rows = conn.exec_driver_sql(
+                f"SELECT {', '.join(names)} FROM {old_name} ORDER BY id")
+            copied = {}
+            total = 0
+            for row in rows:
+                total += 1
+                values = dict(zip(names, row))
+                copied.setdefault(
+                    book_key(values['authors'], values['title']), values)
+            for key, values in copied.items():
+                values['canonical_key'] = key
+
+            if total > len(copied):
+                logging.info(
+                    f"Removing {total - len(copied)} duplicate rows from {table.name}")
+            if copied:
+                conn.execute(table.insert(), list(copied.values()))
+            conn.exec_driver_sql(f"DROP TABLE {old_name}")
+
+
+def create_pooled_session(pool_connections=4, pool_maxsize=16, retries=5):
+    """
+    Create a requests session whose connections are kept alive and reused across calls.
+    Rate limiting and transient server errors are retried with exponential backoff.
+    """
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=1,
+                  status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET", "POST"])
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
-        session.commit()
-    print(f"Imported {count} new books from CSV.")
 
+HTTP_TIMEOUT = 30
+
+# Goodreads RSS session, shared by all feed fetches
+FEED_FETCH_WORKERS = 10
+feed_session = create_pooled_session(pool_connections=10, pool_maxsize=20, retries=3)
 
 # qBittorrent and MyAnonamouse Configuration
 MAM_BASE_URL = "https://www.myanonamouse.net"
 MAM_SEARCH_ENDPOINT = f"{MAM_BASE_URL}/tor/js/loadSearchJSONbasic.php"
 MAM_COOKIE = {"mam_id": "key_here"}
+# Concurrent searches; kept low to stay within MyAnonamouse's rate limits
+MAM_SEARCH_WORKERS = 4
 
 QB_HOST = "192.168.XXX.XXX"
 QB_PORT = 8080
@@ -173,24 +388,44 @@ QB_USERNAME = "admin"
 QB_PASSWORD = ""
 QB_CATEGORY = "myanonamouse"
 
-# Create a qBittorrent session
-qb_session = requests.Session()
-login_data = {
-    'username': QB_USERNAME,
-    'password': QB_PASSWORD
-}
-login_resp = qb_session.post(
-    f"http://{QB_HOST}:{QB_PORT}/api/v2/auth/login", data=login_data)
-login_resp.raise_for_status()
-if "Ok." not in login_resp.text:
-    raise Exception("Failed to authenticate with qBittorrent")
+# Create a MyAnonamouse session so searches reuse one TLS connection
+mam_session = create_pooled_session(pool_connections=10, pool_maxsize=20)
+mam_session.cookies.update(MAM_COOKIE)
+mam_session.headers['User-Agent'] = 'bookfeeder'
+
+# Create a qBittorrent session; it logs in on first use
+qb_session = create_pooled_session()
+
 
+@functools.lru_cache(maxsize=None)
+def login_to_qbittorrent():
+    """
+    Authenticate qb_session with qBittorrent. Cached so it only runs once,
+    and only if a torrent is actually added. A failed login is not cached.
+    """
+    login_data = {
+        'username': QB_USERNAME,
+        'password': QB_PASSWORD
+    }
+    login_resp = qb_session.post(
+        f"http://{QB_HOST}:{QB_PORT}/api/v2/auth/login", data=login_data,
+        timeout=HTTP_TIMEOUT)
+    login_resp.raise_for_status()
+    if "Ok." not in login_resp.text:
+        raise Exception("Failed to authenticate with qBittorrent")
 
+
+@functools.lru_cache(maxsize=4096)
 def normalize_string(s):
     """Normalize string by removing extra whitespace."""
     return ' '.join(s.split())
 
 
+def title_tokens(title):
+    """Split a title into its set of canonical words."""
+    return set(canonical(title).split())
+
+
 def author_matches(book_author, author_info_str):
     """
     Check if the given book_author matches any of the authors in author_info.
@@ -199,28 +434,30 @@ def author_matches(book_author, author_info_str):
     if not author_info_str:
         return False
 
+    return normalize_string(book_author) in author_names(author_info_str)
+
+
+@functools.lru_cache(maxsize=4096)
+def author_names(author_info_str):
+    """
+    Parse an author_info JSON string into the set of its normalized author names.
+    The same strings recur across searches, so results are cached.
+    """
     try:
         author_data = json.loads(author_info_str)
     except json.JSONDecodeError:
-        return False
+        return frozenset()
 
-    norm_requested_author = normalize_string(book_author)
-    for a_id, a_name in author_data.items():
-        if normalize_string(a_name) == norm_requested_author:
-            return True
-
-    return False
+    return frozenset(normalize_string(a_name) for a_name in author_data.values())
 
 
 def title_matches(book_title, torrent_title):
     """
-    Check if all words of the book_title appear in the torrent_title.
+    Check if all words of the book_title appear as words in the torrent_title.
     """
     if not torrent_title:
         return False
-    norm_title = normalize_string(torrent_title)
-    norm_book_title = normalize_string(book_title)
-    return all(word.lower() in norm_title.lower() for word in norm_book_title.split())
+    return title_tokens(book_title) <= title_tokens(torrent_title)
 
 
 def search_on_myanonamouse(book_title, book_author):
@@ -250,21 +487,25 @@ def search_on_myanonamouse(book_title, book_author):
         "thumbnail": "true"
     }
 
-    # Log the JSON payload being sent
-    logging.debug("JSON Payload Sent to MyAnonamouse:")
-    logging.debug(json.dumps(payload, indent=4, ensure_ascii=False))
-    logging.debug("-" * 50)  # Separator for readability
+    # Log the JSON payload being sent; skip formatting it unless debugging
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("JSON Payload Sent to MyAnonamouse:")
+        logging.debug(json.dumps(payload, indent=4, ensure_ascii=False))
+        logging.debug("-" * 50)  # Separator for readability
 
-    resp = requests.post(MAM_SEARCH_ENDPOINT, json=payload, cookies=MAM_COOKIE)
+    resp = mam_session.post(MAM_SEARCH_ENDPOINT, json=payload,
+                            timeout=HTTP_TIMEOUT)
     resp.raise_for_status()
 
-    results = resp.json().get('data', [])
+    results = orjson.loads(resp.content).get('data', [])
     if not results:
         return None
 
+    # Canonicalize the book title once rather than per result
+    book_tokens = title_tokens(book_title)
     for r in results:
         torrent_title = r.get('name')
-        if torrent_title and all(word.lower() in torrent_title.lower() for word in book_title.split()):
+        if torrent_title and book_tokens <= title_tokens(torrent_title):
             dl_hash = r.get('dl')
             torrent_id = r.get('id')
             if dl_hash:
@@ -274,13 +515,28 @@ def search_on_myanonamouse(book_title, book_author):
     return None
 
 
+def find_torrent(book):
+    """
+    Search MyAnonamouse for a missing book. A failed search is logged and returns None,
+    so it only skips this book instead of aborting the whole batch.
+    """
+    try:
+        return search_on_myanonamouse(book['title'], book['authors'])
+    except (requests.RequestException, ValueError) as e:
+        logging.error(
+            f"Search failed for '{book['title']}' by '{book['authors']}': {e}")
+        return None
+
+
 def add_torrent_to_qbittorrent(torrent_url):
+    login_to_qbittorrent()
     add_data = {
         'urls': torrent_url,
         'category': QB_CATEGORY
     }
     add_resp = qb_session.post(
-        f"http://{QB_HOST}:{QB_PORT}/api/v2/torrents/add", data=add_data)
+        f"http://{QB_HOST}:{QB_PORT}/api/v2/torrents/add", data=add_data,
+        timeout=HTTP_TIMEOUT)
     add_resp.raise_for_status()
     if add_resp.text:
         print("qBittorrent response:", add_resp.text)
@@ -295,8 +551,11 @@ if __name__ == "__main__":
     ]
 
     DATABASE_URL = 'sqlite:///books.db'
-    engine = create_engine(DATABASE_URL, echo=False)
+    engine = create_engine(DATABASE_URL, echo=False,
+                           connect_args={'cached_statements': 256})
+    event.listen(engine, "connect", set_sqlite_pragmas)
     Base.metadata.create_all(engine)
+    upgrade_schema(engine)
 
     Session = sessionmaker(bind=engine)
     session = Session()
@@ -317,11 +576,16 @@ if __name__ == "__main__":
 
     # Only search MyAnonamouse and add to qBittorrent if we have missing books
     if missing_books:
-        for book in missing_books:
+        print(
+            f"Searching for {len(missing_books)} missing books on MyAnonamouse...")
+        # Searches are independent, so run a few at a time
+        with ThreadPoolExecutor(max_workers=MAM_SEARCH_WORKERS) as executor:
+            torrent_urls = list(executor.map(find_torrent, missing_books))
+
+        # Add torrents one at a time on the shared qBittorrent session
+        for book, torrent_url in zip(missing_books, torrent_urls):
             authors = book['authors']
             title = book['title']
-            print(f"Searching for '{title}' by '{authors}' on MyAnonamouse...")
-            torrent_url = search_on_myanonamouse(title, authors)
             if torrent_url:
                 print(
                     f"Found torrent for '{title}' by '{authors}': {torrent_url}")
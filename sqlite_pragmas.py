@@ -0,0 +1,16 @@
+# Shared by bookfeeder.py and the Flask app; kept outside `app` so the
+# standalone script can use it without importing Flask.
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Use write-ahead logging so bulk writes don't fsync the whole database on every commit,
+    and give SQLite a larger page cache, memory-mapped reads and in-memory temp tables.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
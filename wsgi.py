@@ -0,0 +1,8 @@
+# Patch the standard library before anything else imports sockets or threads,
+# so requests and Flask yield to other greenlets while waiting on I/O.
+from gevent import monkey
+monkey.patch_all()
+
+from app import create_app  # noqa: E402
+
+app = create_app()